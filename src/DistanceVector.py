@@ -10,6 +10,7 @@
 """
 
 from collections import defaultdict
+import heapq
 import sys
 import os.path
 
@@ -22,7 +23,9 @@ class Router:
     def __init__(self):
         self.graphNodes = defaultdict(dict)
         self.forwardingTables = {}
+        self.parents = {}
         self.messages = []
+        self.messagesBySource = defaultdict(list)
     
     """ @brief Reads the topology file and creates the graph network as a 2D dictionary.
      *
@@ -30,69 +33,177 @@ class Router:
     """    
     def read_topology(self, topologyFile):
         with open(topologyFile, 'r') as topFile:
-            for line in topFile:
-                node1, node2, cost = map(int, line.split())
+            #Reads the whole file at once, then parses each line as a (node1, node2, cost) triple.
+            for node1, node2, cost in map(str.split, topFile.read().splitlines()):
+                node1, node2, cost = int(node1), int(node2), int(cost)
                 self.graphNodes[node1][node2] = cost
                 self.graphNodes[node2][node1] = cost
                 
+    """ @brief Computes the shortest paths from a node to every reachable destination using Dijkstra's algorithm.
+     *
+     *  Stores the nextHop and cost per destination in the node's forwarding table,
+     *  along with the parent of each destination in the node's shortest path tree.
+     *
+     *  @param node     The source node to compute the forwarding table for.
+    """
+    def shortest_paths(self, node):
+        #Binds the graph, tables and heap operations to locals for the inner loop.
+        graph = self.graphNodes
+        table = self.forwardingTables[node] = {}
+        parents = self.parents[node] = {}
+        heappush, heappop = heapq.heappush, heapq.heappop
+        #Priority queue of (cost, destination, nextHop, parent) starting from its own node at cost 0.
+        heap = [(0, node, node, None)]
+
+        #While there are destinations left in the priority queue:
+        while heap:
+            #Pops the destination node with least cost, skipping stale entries for already visited nodes.
+            minCost, minNode, firstHop, parent = heappop(heap)
+            if minNode in table:
+                continue
+            table[minNode] = (firstHop, minCost)
+            parents[minNode] = parent
+            #For the lowest cost node, pushes it's unvisited neighbors with their cost through it.
+            #Immediate neighbors of the node are their own nextHop.
+            for nextNode, nextCost in graph[minNode].items():
+                if nextNode not in table:
+                    heappush(heap, (minCost + nextCost, nextNode, firstHop if minNode != node else nextNode, minNode))
+
     """ @brief Creates the forwarding table for each node in the network using Distance Vector routing.
      *
-     *  @param outputFile   File to write the forwarding table to.
+     *  @param outFile   Open file to write the forwarding table and messages to.
     """
-    def forwarding_table(self, outputFile):
-        with open(outputFile, 'a') as outFile:
-            for node in self.graphNodes:
-                #Initalizes destination for each node in forwarding table.
-                if node not in self.forwardingTables:
-                    self.forwardingTables[node] = {}
-                #Initalizes the node cost for per destination as infinity and 0 for its own node.
-                cost = defaultdict(lambda: float('inf'))
-                cost[node] = 0
-                #Initalizes next hop for per node.
-                nextHop = {}
-
-                #Initalizes the costs of immediate neighbor nodes and lists them as nextHops.
-                for neighbor in self.graphNodes[node]:
-                    cost[neighbor] = self.graphNodes[node][neighbor]
-                    nextHop[neighbor] = neighbor
-
-                #Used to keep track of visited destinations per node.
-                visited = set()
-                visited.add(node)
-
-                #While all destinations have not yet been visited:
-                while len(visited) < len(self.graphNodes):
-                    minNode = None
-                    minCost = float('inf')
-                    #Finds the destination node with least cost and has not yet been visited.
-                    for dest in self.graphNodes:
-                        if (dest not in visited and cost[dest] < minCost):
-                            minNode = dest
-                            minCost = cost[dest]
-                    #Exists while loop if all destination nodes have been visited, else add destination node to visited.
-                    if minNode is None:
-                        break
-                    else:
-                        visited.add(minNode)
-                    #For the previous lowest cost node, checks it's surrounding neighbors to determine 
-                    #if there exists a lower cost to get to such node than the current cost.
-                    for nextNode in self.graphNodes[minNode]:
-                        if nextNode not in visited:
-                            nextCost = self.graphNodes[minNode][nextNode]
-                            if cost[minNode] + nextCost < cost[nextNode]:
-                                cost[nextNode] = cost[minNode] + nextCost
-                                #Next hop to take to get to next node
-                                nextHop[nextNode] = nextHop[minNode]
-                #For each destination in cost table, writes the nextHop to take and the cost it takes to get to each destination from node.
-                for dest in cost:
-                    if dest != node:
-                        self.forwardingTables[node][dest] = (nextHop[dest], cost[dest])
-                        outFile.write(f"{dest} {nextHop[dest]} {cost[dest]}\n")
-
-                self.forwardingTables[node][node] = (node, 0)
-                outFile.write(f"{node} {node} 0\n\n") 
+    def forwarding_table(self, outFile):
+        for node in self.graphNodes:
+            self.shortest_paths(node)
+        self.write_routes(outFile)
+
+    """ @brief Writes the current forwarding table of each node in the network, then sends the messages using them.
+     *
+     *  The messages from each node are sent in the same pass which writes its forwarding table,
+     *  and their output is kept in the order the messages were read.
+     *
+     *  @param outFile   Open file to write the forwarding table and messages to.
+    """
+    def write_routes(self, outFile):
+        lines = []
+        messageLines = [None] * len(self.messages)
+        for node in self.graphNodes:
+            table = self.forwardingTables[node]
+            #For each reachable destination, writes the nextHop to take and the cost it takes to get to each destination from node.
+            for dest, (nextHop, cost) in table.items():
+                if dest != node:
+                    lines.append(f"{dest} {nextHop} {cost}\n")
+
+            lines.append(f"{node} {node} 0\n\n")
+
+            #Sends each message from node which has a valid path to its destination in the forwarding table.
+            for (index, dest, message) in self.messagesBySource.get(node, ()):
+                route = table.get(dest)
+                if route is not None:
+                    nextHop, pathCost = route
+                    messageLines[index] = f"from {node} to {dest} cost {pathCost} hops {node} {nextHop} message {message}\n"
+
+        #Any message not yet sent has no path from its source to its destination.
+        for index, (source, dest, message) in enumerate(self.messages):
+            if messageLines[index] is None:
+                messageLines[index] = f"from {source} to {dest} cost infinite hops unreachable message {message}\n"
+
+        #Writes everything at once, joining the tables and messages into a single string.
+        lines.extend(messageLines)
+        outFile.write("".join(lines))
+
+    """ @brief Updates the forwarding tables after an edge cost has been lowered or a new edge has been added.
+     *
+     *  Relaxes outward from the far end of the edge, only visiting destinations whose cost improves,
+     *  or whose cost stays the same through a lower nextHop, matching the choice made by shortest_paths.
+     *
+     *  @param node1    One end of the changed edge.
+     *  @param node2    Other end of the changed edge.
+     *  @param cost     New cost of the edge.
+    """
+    def decrease_edge(self, node1, node2, cost):
+        graph = self.graphNodes
+        heappush, heappop = heapq.heappush, heapq.heappop
+        for node in self.forwardingTables:
+            table = self.forwardingTables[node]
+            parents = self.parents[node]
+            heap = []
+            for (u, v) in ((node1, node2), (node2, node1)):
+                if u in table:
+                    firstHop = table[u][0] if u != node else v
+                    #Compares (cost, nextHop) so an equal cost path through a lower nextHop also replaces the entry.
+                    if v not in table or (table[u][1] + cost, firstHop) < (table[v][1], table[v][0]):
+                        heappush(heap, (table[u][1] + cost, v, firstHop, u))
+
+            #Only pushes and settles destinations whose (cost, nextHop) is lowered by the changed edge.
+            while heap:
+                minCost, minNode, firstHop, parent = heappop(heap)
+                if minNode in table and (minCost, firstHop) >= (table[minNode][1], table[minNode][0]):
+                    continue
+                table[minNode] = (firstHop, minCost)
+                parents[minNode] = parent
+                for nextNode, nextCost in graph[minNode].items():
+                    if nextNode not in table or (minCost + nextCost, firstHop) < (table[nextNode][1], table[nextNode][0]):
+                        heappush(heap, (minCost + nextCost, nextNode, firstHop, minNode))
+
+    """ @brief Updates the forwarding tables after an edge cost has been raised or the edge has been removed.
+     *
+     *  Only the destinations below the edge in a node's shortest path tree are recomputed,
+     *  seeded with their cheapest neighbor outside of that subtree.
+     *
+     *  @param node1    One end of the changed edge.
+     *  @param node2    Other end of the changed edge.
+    """
+    def increase_edge(self, node1, node2):
+        graph = self.graphNodes
+        heappush, heappop = heapq.heappush, heapq.heappop
+        for node in self.forwardingTables:
+            table = self.forwardingTables[node]
+            parents = self.parents[node]
+            #Finds the end of the edge which is the child in the shortest path tree, if the tree uses the edge.
+            if parents.get(node2) == node1:
+                root = node2
+            elif parents.get(node1) == node2:
+                root = node1
+            else:
+                continue
+
+            #Collects every destination in the subtree below the edge.
+            children = defaultdict(list)
+            for dest, parent in parents.items():
+                children[parent].append(dest)
+            dirty = set()
+            stack = [root]
+            while stack:
+                dest = stack.pop()
+                dirty.add(dest)
+                stack.extend(children[dest])
+            for dest in dirty:
+                del table[dest]
+                del parents[dest]
+
+            #Seeds the priority queue with the cheapest way into each dirty destination from outside of the subtree.
+            heap = []
+            for dest in dirty:
+                for neighbor, nextCost in graph[dest].items():
+                    if neighbor in table:
+                        heappush(heap, (table[neighbor][1] + nextCost, dest, table[neighbor][0] if neighbor != node else dest, neighbor))
+
+            #Runs Dijkstra's algorithm restricted to the dirty destinations.
+            while heap:
+                minCost, minNode, firstHop, parent = heappop(heap)
+                if minNode in table:
+                    continue
+                table[minNode] = (firstHop, minCost)
+                parents[minNode] = parent
+                for nextNode, nextCost in graph[minNode].items():
+                    if nextNode in dirty and nextNode not in table:
+                        heappush(heap, (minCost + nextCost, nextNode, firstHop, minNode))
 
     """ @brief Reads the message file and stores the messages to be sent in 'messages' as a tuple.
+     *
+     *  Also groups the messages by their source node in 'messagesBySource', along with their position in 'messages'.
      *
      *  @param messageFile     The file containing the messages to be sent.
     """    
@@ -100,23 +211,9 @@ class Router:
         with open(messageFile, 'r') as msgFile:
             for line in msgFile:
                 source, dest, message = line.split(maxsplit=2)
-                self.messages.append((int(source), int(dest), message.strip()))
-
-    """ @brief Sends the messages to their respective destinations using forwarding tables. 
-     *
-     *  @param outputFile   File to write the messages to.
-    """    
-    def send_messages(self, outputFile):
-        with open(outputFile, 'a') as outFile:
-            #Extracts the tuple values from list of tuple messages.
-            for (source, dest, message) in self.messages:
-                #Checks if there is a valid path from the source to destination in the forwarding table.
-                if (source in self.forwardingTables and dest in self.forwardingTables[source]):
-                    nextHop, pathCost = self.forwardingTables[source][dest]
-                    path = [source, nextHop]
-                    outFile.write(f"from {source} to {dest} cost {pathCost} hops {' '.join(map(str, path))} message {message}\n")
-                else:
-                    outFile.write(f"from {source} to {dest} cost infinite hops unreachable message {message}\n")
+                source, dest, message = int(source), int(dest), message.strip()
+                self.messagesBySource[source].append((len(self.messages), dest, message))
+                self.messages.append((source, dest, message))
 
     """ @brief Reads the topology changes file and apply the changes to the network.
      *
@@ -125,12 +222,9 @@ class Router:
      *  @return     A list of tuples containing the changes to be made to the network.
     """    
     def read_topology_changes(self, changesFile):
-        topologyChanges = []
         with open(changesFile, 'r') as changeFile:
-            for line in changeFile:
-                    node1, node2, cost = map(int, line.split())
-                    topologyChanges.append((node1, node2, cost))
-            return topologyChanges      
+            #Reads the whole file at once, then parses each line as a (node1, node2, cost) triple.
+            return [(int(node1), int(node2), int(cost)) for node1, node2, cost in map(str.split, changeFile.read().splitlines())]
 
     """ @brief Applies the topology changes to the network.
      *
@@ -138,16 +232,28 @@ class Router:
     """    
     def apply_topology_change(self, topologyChanges):
         for change in topologyChanges:
+            #Looks up the edge without adding unknown nodes to the graph.
+            oldCost = self.graphNodes.get(change[0], {}).get(change[1])
             if change[2] == -999:
-                del self.graphNodes[change[0]][change[1]]
-                #KeyError prevention
-                try:
-                    del self.graphNodes[change[1]][change[0]]
-                except KeyError:
-                    pass
+                #Removes the edge in both directions, ignoring a direction or node which is already missing.
+                if change[0] in self.graphNodes:
+                    self.graphNodes[change[0]].pop(change[1], None)
+                if change[1] in self.graphNodes:
+                    self.graphNodes[change[1]].pop(change[0], None)
             else:
                 self.graphNodes[change[0]][change[1]] = change[2]
-                self.graphNodes[change[1]][change[0]] = change[2]        
+                self.graphNodes[change[1]][change[0]] = change[2]
+
+            #Updates the existing forwarding tables for only the destinations affected by the change.
+            if change[2] == -999 or (oldCost is not None and change[2] > oldCost):
+                self.increase_edge(change[0], change[1])
+            elif oldCost is None or change[2] < oldCost:
+                self.decrease_edge(change[0], change[1], change[2])
+            #Computes the forwarding table of any node added by the change.
+            if self.forwardingTables:
+                for node in self.graphNodes:
+                    if node not in self.forwardingTables:
+                        self.shortest_paths(node)
 
     """ @brief Runs the logic for Distance Vector routing protocol.
      *
@@ -170,16 +276,17 @@ class Router:
 
         #Creates topology, forwarding table, and sends messages.
         self.read_topology(topologyFile)
-        self.forwarding_table(outputFile)
         self.read_message(messageFile)
-        self.send_messages(outputFile)
-        
-        #Applies topology changes and updates FW table and messages per update.
         topologyChanges = self.read_topology_changes(changesFile)
-        for change in topologyChanges:
-            self.apply_topology_change([change])
-            self.forwarding_table(outputFile)
-            self.send_messages(outputFile)
+
+        #Keeps the output file open for the whole run.
+        with open(outputFile, 'a') as outFile:
+            self.forwarding_table(outFile)
+
+            #Applies topology changes and updates FW table and messages per update.
+            for change in topologyChanges:
+                self.apply_topology_change([change])
+                self.write_routes(outFile)
 
 
 """ @brief Main function that instantiates and runs Router.
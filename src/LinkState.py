@@ -8,61 +8,158 @@
  *  @bug When printing the routing tables, the order is not enforced.
  *  (One can tell which table it is via the destination as itself and cost as 0).
 """
-from dijkstar import Graph, find_path
+from collections import defaultdict
+import heapq
 import sys
 import os.path
 
 class Router:
 
-    """ @brief Initalizes graph network using the dijkstar library, 
-     *  forwarding table as a dictionary, and list of messages to be stored.
+    """ @brief Initalizes graph network as a 2D dictionary, 
+     *  forwarding table and shortest path tree as dictionaries, and list of messages to be stored.
      *
     """
     def __init__(self):
-        self.graphNodes = Graph()
+        self.graphNodes = defaultdict(dict)
         self.forwardingTables = {}
+        self.parents = {}
         self.messages = []
+        self.messagesBySource = defaultdict(list)
     
-    """ @brief Reads the topology file and creates the graph network using the dijkstar library.
+    """ @brief Reads the topology file and creates the graph network as a 2D dictionary.
      *
      *  @param topologyFile     The file containing the network topology.
     """
     def read_topology(self, topologyFile):
         with open(topologyFile, 'r') as topFile:
-            for line in topFile:
-                node1, node2, cost = map(int, line.split())
-                self.graphNodes.add_edge(node1, node2, cost)
-                self.graphNodes.add_edge(node2, node1, cost)
+            #Reads the whole file at once, then parses each line as a (node1, node2, cost) triple.
+            for node1, node2, cost in map(str.split, topFile.read().splitlines()):
+                node1, node2, cost = int(node1), int(node2), int(cost)
+                self.graphNodes[node1][node2] = cost
+                self.graphNodes[node2][node1] = cost
+
+    """ @brief Finds the shortest paths from a node to every reachable destination using Dijkstra's algorithm.
+     *
+     *  Stores the nextHop and total cost per destination in the node's forwarding table,
+     *  along with the previous node of each destination in the node's shortest path tree.
+     *
+     *  @param node     The source node to compute the forwarding table for.
+    """
+    def shortest_paths(self, node):
+        self.forwardingTables[node] = {}
+        self.parents[node] = {}
+        #Priority queue of (cost, destination, nextHop, previous node) starting from its own node at cost 0.
+        heap = [(0, node, node, None)]
+
+        #While there are destinations left in the priority queue:
+        while heap:
+            #Pops the destination node with least cost, skipping stale entries for already visited nodes.
+            cost, dest, nextHop, prev = heapq.heappop(heap)
+            if dest in self.forwardingTables[node]:
+                continue
+            self.forwardingTables[node][dest] = (nextHop, cost)
+            self.parents[node][dest] = prev
+            #Immediate neighbors of the node are their own nextHop.
+            for nextNode, nextCost in self.graphNodes[dest].items():
+                if nextNode not in self.forwardingTables[node]:
+                    heapq.heappush(heap, (cost + nextCost, nextNode, nextHop if dest != node else nextNode, dest))
+
+    """ @brief Finds the hops of the shortest path from a node to a destination, excluding the destination itself.
+     *
+     *  The path is rebuilt by walking back from the destination through the node's shortest path tree.
+     *
+     *  @param node     The source node of the path.
+     *  @param dest     The destination node of the path.
+     *
+     *  @return     A list of the nodes along the path, starting at the source node.
+    """
+    def hops(self, node, dest):
+        path = []
+        prev = self.parents[node][dest]
+        while prev is not None:
+            path.append(prev)
+            prev = self.parents[node][prev]
+        path.reverse()
+        return path
 
     """ @brief Creates the forwarding table for each node in the network using Link State routing.
      *
-     *  @param outputFile   File to write the forwarding table to.
+     *  @param outFile   Open file to write the forwarding table and messages to.
     """
-    def forwarding_table(self, outputFile):
-        with open(outputFile, 'a') as outFile:
-            for node in self.graphNodes:
-                outFile.write(f"\n")
-                #Iterates through each destination per node.
-                for dest in self.graphNodes:
-                    #Initalizes destination for per node in forwarding table.
-                    if node not in self.forwardingTables:
-                        self.forwardingTables[node] = {}
-                    #Finds the shortest path along with total cost from node to destination using Dijkstra's algorithm.
-                    path = find_path(self.graphNodes, node, dest)
-                    if (path is not None):
-                        #Appends the shortest path as a list to the forwarding table along with its total cost.
-                        self.forwardingTables[node][dest] = (path.nodes, path.total_cost)
-                        cost = path.total_cost
-                        #If there is no avaliable path, the next hop will be to its self with a cost of 0.
-                        if(len(path.nodes) > 1):
-                            nextHop = path.nodes[1]
-                        else:
-                            nextHop = node
-
-                        outFile.write(f"{dest} {nextHop} {cost} \n")
-            outFile.write(f"\n")
+    def forwarding_table(self, outFile):
+        for node in self.graphNodes:
+            self.shortest_paths(node)
+        self.write_routes(outFile)
+
+    """ @brief Writes the current forwarding table of each node in the network, then sends the messages using them.
+     *
+     *  The messages from each node are sent in the same pass which writes its forwarding table,
+     *  and their output is kept in the order the messages were read.
+     *
+     *  @param outFile   Open file to write the forwarding table and messages to.
+    """
+    def write_routes(self, outFile):
+        lines = []
+        messageLines = [None] * len(self.messages)
+        for node in self.graphNodes:
+            table = self.forwardingTables[node]
+            lines.append(f"\n")
+            #Iterates through each destination per node.
+            for dest in self.graphNodes:
+                if dest in table:
+                    nextHop, cost = table[dest]
+                    lines.append(f"{dest} {nextHop} {cost} \n")
+
+            #Sends each message from node which has a valid path to its destination in the forwarding table.
+            for (index, dest, message) in self.messagesBySource.get(node, ()):
+                route = table.get(dest)
+                if route is not None:
+                    #Only rebuilds the path for destinations which are actually sent a message.
+                    path = self.hops(node, dest)
+                    messageLines[index] = f"from {node} to {dest} cost {route[1]} hops {' '.join(map(str, path))} message {message} \n"
+        lines.append(f"\n")
+
+        #Any message not yet sent has no path from its source to its destination.
+        for index, (source, dest, message) in enumerate(self.messages):
+            if messageLines[index] is None:
+                messageLines[index] = f"from {source} to {dest} cost infinite hops unreachable message {message} \n"
+
+        #Writes everything at once, joining the tables and messages into a single string.
+        lines.extend(messageLines)
+        outFile.write("".join(lines))
+
+    """ @brief Finds the nodes whose forwarding tables may change due to a change in an edge's cost.
+     *
+     *  When the edge is removed or its cost is raised, only nodes with a shortest path across the edge can change.
+     *  When the edge is added or its cost is lowered, only nodes which reach one end of the edge as cheap or cheaper through the other can change.
+     *
+     *  @param node1    One end of the changed edge.
+     *  @param node2    Other end of the changed edge.
+     *  @param oldCost  Previous cost of the edge, or None if the edge did not exist.
+     *  @param newCost  New cost of the edge, or -999 if the edge is removed.
+     *
+     *  @return     A list of nodes whose forwarding tables should be recomputed.
+    """
+    def affected_nodes(self, node1, node2, oldCost, newCost):
+        affected = []
+        for node, table in self.forwardingTables.items():
+            for (u, v) in ((node1, node2), (node2, node1)):
+                if newCost == -999 or (oldCost is not None and newCost > oldCost):
+                    #Checks if the shortest path to one end of the edge crosses it from the other end.
+                    if self.parents[node].get(v) == u:
+                        affected.append(node)
+                        break
+                elif oldCost is None or newCost < oldCost:
+                    #Checks if one end of the edge is reached as cheap or cheaper by crossing it from the other end,
+                    #since an equal cost path may still give a lower nextHop.
+                    if u in table and (v not in table or table[u][1] + newCost <= table[v][1]):
+                        affected.append(node)
+                        break
+        return affected
 
     """ @brief Reads the message file and stores the messages to be sent in 'messages' as a tuple.
+     *
+     *  Also groups the messages by their source node in 'messagesBySource', along with their position in 'messages'.
      *
      *  @param messageFile     The file containing the messages to be sent.
     """
@@ -70,23 +167,9 @@ class Router:
         with open(messageFile, 'r') as msgFile:
             for line in msgFile:
                 source, dest, message = line.split(maxsplit=2)
-                self.messages.append((int(source), int(dest), message.strip()))
-
-    """ @brief Sends the messages to their respective destinations using forwarding tables. 
-     *
-     *  @param outputFile   File to write the messages to.
-    """
-    def send_messages(self, outputFile):
-        with open(outputFile, 'a') as outFile:
-            #Extracts the tuple values from list of tuple messages. 
-            for (source, dest, message) in self.messages:
-                    #Checks if there is a valid path from the source to destination in the forwarding table. 
-                    if (source in self.forwardingTables and dest in self.forwardingTables[source]):
-                        path = self.forwardingTables[source][dest][0]
-                        cost = self.forwardingTables[source][dest][1]
-                        outFile.write(f"from {source} to {dest} cost {cost} hops {' '.join(map(str, path[:-1]))} message {message} \n")
-                    else:
-                        outFile.write(f"from {source} to {dest} cost infinite hops unreachable message {message} \n")
+                source, dest, message = int(source), int(dest), message.strip()
+                self.messagesBySource[source].append((len(self.messages), dest, message))
+                self.messages.append((source, dest, message))
 
     """ @brief Reads the topology changes file and apply the changes to the network.
      *
@@ -95,12 +178,9 @@ class Router:
      *  @return     A list of tuples containing the changes to be made to the network.
     """    
     def read_topology_changes(self, changesFile):
-        topologyChanges = []
         with open(changesFile, 'r') as changeFile:
-            for line in changeFile:
-                    node1, node2, cost = map(int, line.split())
-                    topologyChanges.append((node1, node2, cost))
-            return topologyChanges   
+            #Reads the whole file at once, then parses each line as a (node1, node2, cost) triple.
+            return [(int(node1), int(node2), int(cost)) for node1, node2, cost in map(str.split, changeFile.read().splitlines())]
     
     """ @brief Applies the topology changes to the network.
      *
@@ -108,16 +188,28 @@ class Router:
     """
     def apply_topology_change(self, topologyChanges):
         for change in topologyChanges:
+            #Looks up the edge without adding unknown nodes to the graph.
+            oldCost = self.graphNodes.get(change[0], {}).get(change[1])
+            #Finds the affected nodes before the change, while the forwarding tables still match the network.
+            affected = self.affected_nodes(change[0], change[1], oldCost, change[2])
             if change[2] == -999:
-                self.graphNodes.remove_edge(change[0], change[1])
-                #In case edge has not been removed above.
-                try:
-                    self.graphNodes.remove_edge(change[1], change[0])
-                except KeyError:
-                    pass
+                #Removes the edge in both directions, ignoring a direction or node which is already missing.
+                if change[0] in self.graphNodes:
+                    self.graphNodes[change[0]].pop(change[1], None)
+                if change[1] in self.graphNodes:
+                    self.graphNodes[change[1]].pop(change[0], None)
             else:
-                self.graphNodes.add_edge(change[0], change[1], change[2])
-                self.graphNodes.add_edge(change[1], change[0], change[2])
+                self.graphNodes[change[0]][change[1]] = change[2]
+                self.graphNodes[change[1]][change[0]] = change[2]
+
+            #Recomputes only the affected forwarding tables.
+            for node in affected:
+                self.shortest_paths(node)
+            #Computes the forwarding table of any node added by the change.
+            if self.forwardingTables:
+                for node in self.graphNodes:
+                    if node not in self.forwardingTables:
+                        self.shortest_paths(node)
 
     """ @brief Runs the logic for Link State routing protocol.
      *
@@ -140,16 +232,17 @@ class Router:
 
         #Creates topology, forwarding table, and sends messages.
         self.read_topology(topologyFile)
-        self.forwarding_table(outputFile)
         self.read_message(messageFile)
-        self.send_messages(outputFile)
-
-        #Applies topology changes and updates FW table and messages per update.
         topologyChanges = self.read_topology_changes(changesFile)
-        for change in topologyChanges:
-            self.apply_topology_change([change])
-            self.forwarding_table(outputFile)
-            self.send_messages(outputFile)
+
+        #Keeps the output file open for the whole run.
+        with open(outputFile, 'a') as outFile:
+            self.forwarding_table(outFile)
+
+            #Applies topology changes and updates FW table and messages per update.
+            for change in topologyChanges:
+                self.apply_topology_change([change])
+                self.write_routes(outFile)
 
 
 """ @brief Main function that instantiates and runs Router.